@@ -19,6 +19,8 @@ def build_parser():
     gb.add_argument("--dir", dest="in_dir", help="Directory with .bib files")
     gb.add_argument("--file", dest="in_file", help="Single .bib file")
     pb.add_argument("--out", required=True, help="Output NDJSON file")
+    pb.add_argument("--keep-raw", action="store_true", help="Keep unmapped BibTeX fields under extra.raw")
+    pb.add_argument("--quiet", action="store_true", help="Do not list every parsed entry")
 
     # csv subcommand (placeholder)
     pcsv = sub.add_parser("csv", help="Process CSV inputs")
@@ -37,12 +39,12 @@ def main():
             if not os.path.isdir(args.in_dir):
                 print(f"[ERROR] Directory not found: {args.in_dir}", file=sys.stderr)
                 sys.exit(2)
-            entries = normalize_bib_dir(args.in_dir)
+            entries = normalize_bib_dir(args.in_dir, keep_raw=args.keep_raw, verbose=not args.quiet)
         else:
             if not os.path.isfile(args.in_file):
                 print(f"[ERROR] File not found: {args.in_file}", file=sys.stderr)
                 sys.exit(2)
-            entries = read_bib_file(args.in_file)
+            entries = read_bib_file(args.in_file, keep_raw=args.keep_raw)
 
         ensure_parent_dir(args.out)
         dump_ndjson(entries, args.out)
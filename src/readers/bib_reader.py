@@ -18,14 +18,48 @@ Code style: English only, minimal type hints (only where obvious).
 
 import os
 import re
-import json
+import sys
 import hashlib
+from functools import partial
 from typing import List, Dict, Any, Optional, Tuple
 
-import bibtexparser
-from bibtexparser.bparser import BibTexParser
+from bibtexparser.bibdatabase import COMMON_STRINGS, STANDARD_TYPES
 from bibtexparser.customization import convert_to_unicode
 
+try:
+    from .bib_scanner import scan_entries
+    from .file_pool import list_files, map_files, safe_call, write_ndjson
+except ImportError:  # run as a script: python src/readers/bib_reader.py
+    from bib_scanner import scan_entries
+    from file_pool import list_files, map_files, safe_call, write_ndjson
+
+_KEYWORD_SPLIT_RE = re.compile(r"[;,]\s*|\n+")
+_SLUG_DOI_URL_RE = re.compile(r"https?://doi\.org/")
+_NONALNUM_RE = re.compile(r"[^a-z0-9]+")
+_MULTIDASH_RE = re.compile(r"-{2,}")
+_DOI_PREFIX_RE = re.compile(r"^https?://doi\.org/", re.I)
+_DASH_TABLE = str.maketrans("\u2012\u2013\u2014", "---")
+
+# Raw field names already mapped onto the normalized schema; keep_raw only
+# carries the remaining ones under extra["raw"]
+_CAPTURED_FIELDS = frozenset({
+    "id", "entrytype", "key", "title", "author", "year", "journal", "booktitle",
+    "howpublished", "volume", "number", "pages", "publisher", "issn", "isbn",
+    "doi", "url", "keywords", "abstract", "series", "address", "location", "numpages",
+})
+
+# BibTeX entry type -> venue type
+_VENUE_TYPES = {
+    "article": "journal",
+    "inproceedings": "conference",  # ACM/IEEE conferences
+    "proceedings": "conference",
+    "book": "book",
+    "inbook": "book",
+    "phdthesis": "thesis",
+    "mastersthesis": "thesis",
+    "bachelorthesis": "thesis",
+}
+
 # -----------------------------
 # Utilities
 # -----------------------------
@@ -33,16 +67,16 @@ from bibtexparser.customization import convert_to_unicode
 def _slugify(text: str) -> str:
     text = text or ""
     text = text.lower()
-    text = re.sub(r"https?://doi\.org/", "", text.strip())
-    text = re.sub(r"[^a-z0-9]+", "-", text)
-    return re.sub(r"-{2,}", "-", text).strip("-")
+    text = _SLUG_DOI_URL_RE.sub("", text.strip())
+    text = _NONALNUM_RE.sub("-", text)
+    return _MULTIDASH_RE.sub("-", text).strip("-")
 
 
 def _clean_doi(doi: Optional[str]) -> Optional[str]:
     if not doi:
         return None
     doi = doi.strip()
-    doi = re.sub(r"^https?://doi\.org/", "", doi, flags=re.I)
+    doi = _DOI_PREFIX_RE.sub("", doi)
     return doi or None
 
 
@@ -66,16 +100,13 @@ def _split_authors(author_field: Optional[str]) -> List[Dict[str, str]]:
 def _split_keywords(kw: Optional[str]) -> List[str]:
     if not kw:
         return []
-    raw = re.split(r"[;,]\s*|\n+", kw)
-    cleaned = [k.strip() for k in raw if k and k.strip()]
-    seen = set()
-    result = []
-    for k in cleaned:
-        lk = k.lower()
-        if lk not in seen:
-            seen.add(lk)
-            result.append(k)
-    return result
+    # Case-insensitive dedup keeping the first spelling, in first-seen order
+    result: Dict[str, str] = {}
+    for k in _KEYWORD_SPLIT_RE.split(kw):
+        k = k.strip()
+        if k:
+            result.setdefault(k.lower(), k)
+    return list(result.values())
 
 
 def _prefer_venue(entry: Dict[str, Any]) -> Optional[str]:
@@ -99,37 +130,28 @@ def _compute_hash(title: Optional[str], authors: List[Dict[str, str]], year: Opt
     a = ",".join([a["full"] for a in authors]) if authors else ""
     y = str(year) if year is not None else ""
     base = f"{title or ''}||{a}||{y}"
-    return "sha1:" + hashlib.sha1(base.encode("utf-8")).hexdigest()
+    return "b2:" + hashlib.blake2b(base.encode("utf-8"), digest_size=16).hexdigest()
 
 
 def _parse_pages(pages: Optional[str]) -> Tuple[Optional[str], Optional[str], Optional[int]]:
     if not pages:
         return None, None, None
-    txt = str(pages).strip()
-    # Normalize separators (en dash, em dash, hyphen)
-    txt_norm = re.sub(r"[\u2012\u2013\u2014\-]", "-", txt)
-    m = re.match(r"\s*(\d+)\s*-(\d+)\s*$", txt_norm)
-    if m:
-        start, end = m.group(1), m.group(2)
-        try:
-            n = int(end) - int(start) + 1
-        except Exception:
-            n = None
-        return start, end, n
+    # Normalize separators (figure dash, en dash, em dash) to a hyphen
+    txt = str(pages).strip().translate(_DASH_TABLE)
+    start, sep, end = txt.partition("-")
+    start = start.rstrip()
+    # BibTeX ranges are written "12--34"; a single hyphen is common too
+    end = end.lstrip("-").rstrip()
+    if sep and start.isdecimal() and end.isdecimal():
+        return start, end, int(end) - int(start) + 1
     # If single number or non-standard, keep as is
     return None, None, None
 
 
 def _detect_venue_type(entry_type: Optional[str], venue: Optional[str], series: Optional[str]) -> Optional[str]:
-    et = (entry_type or "").lower()
-    if et == "article":
-        return "journal"
-    if et in ("inproceedings", "proceedings"):  # ACM/IEEE conferences
-        return "conference"
-    if et in ("book", "inbook"):
-        return "book"
-    if et in ("phdthesis", "mastersthesis", "bachelorthesis"):
-        return "thesis"
+    vt = _VENUE_TYPES.get((entry_type or "").lower())
+    if vt:
+        return vt
     # Fallbacks based on series hints
     if series:
         s = series.lower()
@@ -221,39 +243,34 @@ PROVIDERS: List[BaseProvider] = [
 # Normalization core
 # -----------------------------
 
-def _normalize_raw_entry(raw: Dict[str, Any], src_file: str, src_folder: str) -> Dict[str, Any]:
-    # bibtexparser uses upper-case keys ID/ENTRYTYPE and lower-case field names.
-    # Create case-insensitive access
-    e = {}
-    for k, v in raw.items():
-        e[k] = v
-        e[k.lower()] = v
-
-    entry_type = e.get("ENTRYTYPE") or e.get("entrytype")
-    bib_id = e.get("ID") or e.get("id") or e.get("key")
-
-    title = e.get("title")
-    authors = _split_authors(e.get("author"))
-    year = _safe_int(e.get("year"))
-
-    venue = _prefer_venue(e)
-    volume = e.get("volume")
-    number = e.get("number")
-    pages_text = e.get("pages")
+def _normalize_raw_entry(raw: Dict[str, Any], src_file: str, src_folder: str, keep_raw: bool = False) -> Dict[str, Any]:
+    # Raw entries use upper-case ID/ENTRYTYPE and lower-case field names (as
+    # bibtexparser does), so only those two keys need a lower-case fallback.
+    entry_type = raw.get("ENTRYTYPE") or raw.get("entrytype")
+    bib_id = raw.get("ID") or raw.get("id") or raw.get("key")
+
+    title = raw.get("title")
+    authors = _split_authors(raw.get("author"))
+    year = _safe_int(raw.get("year"))
+
+    venue = _prefer_venue(raw)
+    volume = raw.get("volume")
+    number = raw.get("number")
+    pages_text = raw.get("pages")
     page_start, page_end, np_from_range = _parse_pages(pages_text)
 
-    publisher = e.get("publisher")
-    issn = e.get("issn")
-    isbn = e.get("isbn")
-
-    doi = _clean_doi(e.get("doi"))
-    url = e.get("url")
-    keywords = _split_keywords(e.get("keywords"))
-    abstract = e.get("abstract")
-    series = e.get("series")
-    address = e.get("address")  # ACM often has city/state here
-    location = e.get("location") # ACM explicit location
-    numpages_field = _safe_int(e.get("numpages"))
+    publisher = raw.get("publisher")
+    issn = raw.get("issn")
+    isbn = raw.get("isbn")
+
+    doi = _clean_doi(raw.get("doi"))
+    url = raw.get("url")
+    keywords = _split_keywords(raw.get("keywords"))
+    abstract = raw.get("abstract")
+    series = raw.get("series")
+    address = raw.get("address")  # ACM often has city/state here
+    location = raw.get("location") # ACM explicit location
+    numpages_field = _safe_int(raw.get("numpages"))
     # prefer explicit numpages over computed
     numpages = numpages_field if numpages_field is not None else np_from_range
 
@@ -262,7 +279,8 @@ def _normalize_raw_entry(raw: Dict[str, Any], src_file: str, src_folder: str) ->
 
     normalized = {
         "id": bib_id,
-        "entry_type": (entry_type or "").lower() if entry_type else None,
+        # Interned: a handful of distinct values shared by every entry
+        "entry_type": sys.intern(entry_type.lower()) if entry_type else None,
         "title": title,
         "authors": authors,
         "year": year,
@@ -293,7 +311,7 @@ def _normalize_raw_entry(raw: Dict[str, Any], src_file: str, src_folder: str) ->
         "key_normalized": key_normalized,
         "hash": doc_hash,
         "tags": [],
-        "extra": {"raw": raw},
+        "extra": {"raw": {k: v for k, v in raw.items() if k.lower() not in _CAPTURED_FIELDS}} if keep_raw else {},
     }
     # Mark if URL seems proxied
     if url and "ezproxy" in str(url).lower():
@@ -316,41 +334,55 @@ def _apply_providers(normalized: Dict[str, Any], raw: Dict[str, Any]) -> Dict[st
     return normalized
 
 
-def read_bib_file(file_bib_path: str) -> List[Dict[str, Any]]:
+def read_bib_file(file_bib_path: str, keep_raw: bool = False) -> List[Dict[str, Any]]:
     with open(file_bib_path, encoding="utf-8") as bibfile:
-        parser = BibTexParser(common_strings=True)
-        parser.customization = convert_to_unicode
-        bib_database = bibtexparser.load(bibfile, parser=parser)
+        text = bibfile.read()
 
+    src_folder = os.path.dirname(file_bib_path)
     results: List[Dict[str, Any]] = []
-    for raw_entry in bib_database.entries:
-        normalized = _normalize_raw_entry(raw_entry, src_file=file_bib_path, src_folder=os.path.dirname(file_bib_path))
+    # Same inputs BibTexParser(common_strings=True) had: month macros plus the
+    # file's own @string definitions; non-standard types (@online, ...) are
+    # skipped as its default ignore_nonstandard_types=True did
+    macros = dict(COMMON_STRINGS)
+    for _, _, entry_type, bib_id, fields in scan_entries(text, macros):
+        if entry_type not in STANDARD_TYPES:
+            continue
+        # Same shape bibtexparser produced: ID/ENTRYTYPE plus lower-case field names
+        raw_entry = convert_to_unicode({"ENTRYTYPE": entry_type, "ID": bib_id, **fields})
+        normalized = _normalize_raw_entry(raw_entry, src_file=file_bib_path, src_folder=src_folder, keep_raw=keep_raw)
         normalized = _apply_providers(normalized, raw_entry)
         results.append(normalized)
     return results
 
 
-def normalize_bib_dir(dirpath: str, file_extension: str = ".bib") -> List[Dict[str, Any]]:
+def _summary_line(e: Dict[str, Any]) -> str:
+    title = (e.get("title") or "").replace("\n", " ")
+    title_short = (title[:77] + "...") if len(title) > 80 else title
+    src = e.get("source_provider") or "?"
+    return f"• {e['id']} | {e.get('entry_type')} | {e.get('year')} | {src} | {title_short}\n"
+
+
+def normalize_bib_dir(dirpath: str, file_extension: str = ".bib", keep_raw: bool = False,
+                      verbose: bool = False) -> List[Dict[str, Any]]:
     """
     Walk a directory, parse every *.bib, and return a list of normalized entries.
+    Files are parsed in parallel worker processes when there are enough of them.
+    With keep_raw, fields not mapped onto the schema are kept under extra["raw"].
+    With verbose, a one-line summary per entry is written to stdout.
     """
+    paths = list_files(dirpath, file_extension.lower())
+    results = map_files(partial(safe_call, partial(read_bib_file, keep_raw=keep_raw)), paths)
+
     all_entries: List[Dict[str, Any]] = []
-    for filename in os.listdir(dirpath):
-        if filename.lower().endswith(file_extension.lower()):
-            file_path = os.path.join(dirpath, filename)
-            try:
-                entries = read_bib_file(file_path)
-                all_entries.extend(entries)
-            except Exception as ex:
-                print(f"[WARN] Failed to parse {file_path}: {ex}")
-
-    for e in all_entries:
-        yr = e.get("year")
-        et = e.get("entry_type")
-        title = (e.get("title") or "").replace("\n", " ")
-        title_short = (title[:77] + "...") if len(title) > 80 else title
-        src = e.get("source_provider") or "?"
-        print(f"• {e['id']} | {et} | {yr} | {src} | {title_short}")
+    for file_path, (entries, error) in zip(paths, results):
+        if error is not None:
+            print(f"[WARN] Failed to parse {file_path}: {error}")
+            continue
+        all_entries.extend(entries)
+
+    if verbose:
+        # One write for the whole listing instead of a print per entry
+        sys.stdout.write("".join(map(_summary_line, all_entries)))
 
     return all_entries
 
@@ -358,10 +390,10 @@ def normalize_bib_dir(dirpath: str, file_extension: str = ".bib") -> List[Dict[s
 def dump_ndjson(entries: List[Dict[str, Any]], out_path: str) -> None:
     """
     Save entries to NDJSON (one JSON object per line).
+    Lines go through a large write buffer so the OS sees few, big writes.
+    Uses orjson when installed, stdlib json otherwise.
     """
-    with open(out_path, "w", encoding="utf-8") as f:
-        for e in entries:
-            f.write(json.dumps(e, ensure_ascii=False) + "\n")
+    write_ndjson(entries, out_path)
 
 
 # -----------------------------
@@ -396,9 +428,11 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Normalize BibTeX files into a unified JSON schema.")
     parser.add_argument("dir", help="Directory containing .bib files")
     parser.add_argument("--out", dest="out", default=None, help="NDJSON output path (optional)")
+    parser.add_argument("--keep-raw", action="store_true", help="Keep unmapped BibTeX fields under extra.raw")
+    parser.add_argument("--quiet", action="store_true", help="Do not list every parsed entry")
     args = parser.parse_args()
 
-    entries_ = normalize_bib_dir(args.dir)
+    entries_ = normalize_bib_dir(args.dir, keep_raw=args.keep_raw, verbose=not args.quiet)
     if args.out:
         dump_ndjson(entries_, args.out)
         print(f"Saved {len(entries_)} entries to {args.out}")
@@ -0,0 +1,141 @@
+"""
+Single-pass BibTeX scanner shared by bib2table and the bib reader.
+
+Entry headers are located with one compiled search, structure (braces, '=',
+',', quoted strings, barewords) comes from one compiled token regex, and
+brace matching jumps between brace characters, so no Python-level loop runs
+per character of input.
+"""
+
+import re
+import sys
+from typing import List
+
+# Every alternative below is a plain character class or a disjoint alternation
+# (the quoted-string body is [^"\\]|\\.), so stdlib re matches in linear time
+# with no catastrophic backtracking. RE2-style engines are deliberately not used:
+# their Python bindings re-encode the whole text on each match(text, pos) call,
+# which would make this token-at-a-time scan quadratic.
+_HEADER_RE = re.compile(r'@\s*([A-Za-z]+)\s*\{')
+_TOKEN_RE = re.compile(r'\s*(?:(\{)|(\})|(=)|(,)|"((?:[^"\\]|\\.)*)"|([^\s,{}="]+))', re.S)
+_LBRACE, _RBRACE, _EQUALS, _COMMA, _QUOTED, _BAREWORD = range(1, 7)
+_BRACE_RE = re.compile(r'[{}]')
+_SPACE_RE = re.compile(r'\s*')
+_BAREWORD_END_RE = re.compile(r'[,}]')
+_MACRO_NAME_RE = re.compile(r'[^\s,{}#="]+')
+_CONCAT_RE = re.compile(r'\s*#\s*')
+
+def _match_brace(text: str, pos: int, depth: int = 1) -> int:
+    # index of the '}' closing `depth` open braces, or len(text) when unbalanced
+    for m in _BRACE_RE.finditer(text, pos):
+        depth += 1 if m.group() == '{' else -1
+        if depth == 0: return m.start()
+    return len(text)
+
+def _scan_body(text: str, pos: int, macros=None):
+    # pos sits right after the entry's opening '{'; returns (citation_key, fields, end)
+    key_start = pos
+    while True:
+        tok = _TOKEN_RE.match(text, pos)
+        if tok is None:
+            # e.g. an unbalanced '"': close the entry at its matching brace
+            end = _match_brace(text, pos)
+            return (text[key_start:end].strip(), {}, min(end + 1, len(text)))
+        kind, pos = tok.lastindex, tok.end()
+        if kind == _COMMA: break
+        if kind == _RBRACE: return (text[key_start:tok.start(kind)].strip(), {}, pos)
+        if kind == _LBRACE: pos = min(_match_brace(text, pos) + 1, len(text))
+    citation_key, fields = text[key_start:tok.start(kind)].strip(), {}
+    while True:
+        tok = _TOKEN_RE.match(text, pos)
+        if tok is None: break
+        kind, pos = tok.lastindex, tok.end()
+        if kind == _RBRACE: return (citation_key, fields, pos)
+        if kind == _COMMA: continue
+        if kind != _BAREWORD: break
+        field_name = tok.group(kind).lower()
+        tok = _TOKEN_RE.match(text, pos)
+        if tok is None or tok.lastindex != _EQUALS: break
+        pos = _SPACE_RE.match(text, tok.end()).end()
+        val, pos = _parse_field_value(text, pos, macros)
+        fields[field_name] = _clean_bib_value(val)
+    # malformed tail: close the entry at its matching brace
+    end = _match_brace(text, pos)
+    return (citation_key, fields, min(end + 1, len(text)))
+
+def scan_entries(text: str, macros=None):
+    # yields (start, end, entry_type, citation_key, fields) for every @entry in text;
+    # with a macros dict (lower-case name -> value), @string definitions are added
+    # to it as they appear and bareword values / '#' concatenations are expanded
+    pos = 0
+    while True:
+        m = _HEADER_RE.search(text, pos)
+        if not m: return
+        entry_type = sys.intern(m.group(1).lower())
+        if entry_type == 'comment':
+            # free text: only braces count, a stray '"' must not run into later entries
+            end = _match_brace(text, m.end())
+            citation_key, fields, pos = text[m.end():end].strip(), {}, min(end + 1, len(text))
+        else:
+            citation_key, fields, pos = _scan_body(text, m.end(), macros)
+        if macros is not None and entry_type == 'string':
+            _add_string_def(citation_key, macros)
+        yield (m.start(), pos, entry_type, citation_key, fields)
+
+def split_bibtex_entries(text: str) -> List[str]:
+    return [text[start:end] for start, end, *_ in scan_entries(text)]
+
+def _parse_bib_value(s: str, pos: int):
+    L = len(s)
+    if pos >= L: return ("", pos)
+    ch = s[pos]
+    if ch == '{':
+        end = _match_brace(s, pos+1)
+        return (s[pos+1:end], min(end+1, L))
+    elif ch == '"':
+        end = s.find('"', pos+1)
+        while end != -1 and s[end-1] == '\\':
+            end = s.find('"', end+1)
+        if end == -1: return (s[pos+1:], L)
+        return (s[pos+1:end], end+1)
+    else:
+        m = _BAREWORD_END_RE.search(s, pos)
+        end = m.start() if m else L
+        return (s[pos:end], end)
+
+def _parse_field_value(s: str, pos: int, macros):
+    if macros is None: macros = {}  # no @string table: barewords stay literal, '#' still joins
+    parts = []
+    while True:
+        if pos < len(s) and s[pos] not in '{"':
+            m = _MACRO_NAME_RE.match(s, pos)
+            word = m.group() if m else ''
+            if m: pos = m.end()
+            parts.append(macros.get(word.lower(), word))
+        else:
+            val, pos = _parse_bib_value(s, pos)
+            parts.append(val)
+        m = _CONCAT_RE.match(s, pos)
+        if not m: return (''.join(parts), pos)
+        pos = m.end()
+
+def _add_string_def(body: str, macros) -> None:
+    # @string{name = value}: _scan_body hands the whole body back as the citation key
+    name, eq, val = body.partition('=')
+    if not eq: return
+    val = val.strip()
+    macros[name.strip().lower()] = _clean_bib_value(_parse_field_value(val, 0, macros)[0])
+
+def _clean_bib_value(v: str) -> str:
+    v2 = v.strip()
+    # peel outer braces unless the first '{' closes before the last character
+    while v2.startswith('{') and v2.endswith('}') and _match_brace(v2, 1) >= len(v2) - 1:
+        v2 = v2[1:-1].strip()
+    return ' '.join(v2.split())
+
+def parse_entry(entry_text: str):
+    text = entry_text.lstrip()
+    m = _HEADER_RE.match(text)
+    if not m: return ("unknown", "unknown_key", {})
+    citation_key, fields, _ = _scan_body(text, m.end())
+    return (sys.intern(m.group(1).lower()), citation_key, fields)
@@ -8,11 +8,26 @@ from __future__ import annotations
 import csv
 import os
 import re
-import json
+import sys
 import hashlib
+from functools import partial
 from typing import List, Dict, Any, Optional
 
+try:
+    from .file_pool import list_files, map_files, safe_call, write_ndjson
+except ImportError:  # run as a script: python src/readers/csv_reader.py
+    from file_pool import list_files, map_files, safe_call, write_ndjson
+
 DOI_RE = re.compile(r"^10\.\d{4,9}/\S+$", re.IGNORECASE)
+_DOI_URL_RE = re.compile(r"^https?://(?:dx\.)?doi\.org/", re.I)
+_TRAIL_PUNCT_RE = re.compile(r"[\s\]\).;,]+$")
+_SLUG_DOI_URL_RE = re.compile(r"https?://doi\.org/")
+_NONALNUM_RE = re.compile(r"[^a-z0-9]+")
+_MULTIDASH_RE = re.compile(r"-{2,}")
+_WS_RE = re.compile(r"\s+")
+_AUTHOR_SPLIT_RE = re.compile(r"\s*;\s*|\s+\band\b\s+|\s*\|\s*")
+# exactly when the ' and ' alternative above can match: whitespace on both sides
+_AND_SEP_RE = re.compile(r"\sand\s")
 
 def _safe_int(s: Optional[str]) -> Optional[int]:
     if s is None:
@@ -24,22 +39,24 @@ def _safe_int(s: Optional[str]) -> Optional[int]:
 
 def _slugify(text: str) -> str:
     text = (text or "").lower().strip()
-    text = re.sub(r"https?://doi\.org/", "", text)
-    text = re.sub(r"[^a-z0-9]+", "-", text)
-    return re.sub(r"-{2,}", "-", text).strip("-")
+    text = _SLUG_DOI_URL_RE.sub("", text)
+    text = _NONALNUM_RE.sub("-", text)
+    return _MULTIDASH_RE.sub("-", text).strip("-")
 
 def _compute_hash(title: Optional[str], authors: List[Dict[str, str]], year: Optional[int]) -> str:
     a = ",".join([a["full"] for a in authors]) if authors else ""
     y = str(year) if year is not None else ""
     base = f"{title or ''}||{a}||{y}"
-    return "sha1:" + hashlib.sha1(base.encode("utf-8")).hexdigest()
+    return "b2:" + hashlib.blake2b(base.encode("utf-8"), digest_size=16).hexdigest()
 
 def _clean_doi(doi: Optional[str]) -> Optional[str]:
     if not doi:
         return None
     s = str(doi).strip().replace("\n", " ")
-    s = re.sub(r"^https?://(?:dx\.)?doi\.org/", "", s, flags=re.I)
-    s = re.sub(r"[\s\]\).;,]+$", "", s).strip()
+    # common case: already a bare DOI with nothing trailing, so both subs are no-ops
+    if not (s.startswith("10.") and s[-1] not in "]).;,"):
+        s = _DOI_URL_RE.sub("", s)
+        s = _TRAIL_PUNCT_RE.sub("", s).strip()
     if not DOI_RE.match(s):
         return None
     return s.lower()
@@ -52,15 +69,25 @@ def _split_authors_csv(author_field: Optional[str]) -> List[Dict[str, str]]:
     """
     if not author_field:
         return []
-    raw = re.split(r"\s*;\s*|\s+\band\b\s+|\s*\|\s*", author_field.strip())
+    field = author_field.strip()
+    if "|" not in field and ("and" not in field or not _AND_SEP_RE.search(field)):
+        # only ';' can separate here: split without the regex engine
+        raw = [x.strip() for x in field.split(";")]
+    else:
+        raw = _AUTHOR_SPLIT_RE.split(field)
     out = []
-    for p in [x for x in raw if x]:
+    for p in raw:
+        if not p:
+            continue
         if "," in p:
-            last, first = [x.strip() for x in p.split(",", 1)]
+            last, _, first = p.partition(",")
+            last = last.strip()
+            first = first.strip()
         else:
+            # split() tokens carry no surrounding whitespace, so no strip needed
             tokens = p.split()
-            last = tokens[-1].strip() if tokens else ""
-            first = " ".join(tokens[:-1]).strip()
+            last = tokens[-1] if tokens else ""
+            first = " ".join(tokens[:-1])
         out.append({"full": p.strip(), "last": last, "first": first})
     return out
 
@@ -74,28 +101,87 @@ def _detect_venue_type(content_type: Optional[str]) -> Optional[str]:
         return "book"
     return None
 
-def _get_row_val(row: Dict[str, Any], *candidates: str) -> Optional[str]:
-    # case/space-insensitive access
-    lowmap = {re.sub(r"\s+", " ", k.strip().lower()): v for k, v in row.items()}
-    for cand in candidates:
-        key = re.sub(r"\s+", " ", cand.strip().lower())
-        if key in lowmap and str(lowmap[key]).strip() != "":
-            return str(lowmap[key]).strip()
+def _sniff_delim(sample: str, filename: str) -> str:
+    # Most frequent candidate on the header line wins (titles in the rows may
+    # hold commas); a .tsv with any tab in its header is tab-delimited.
+    # csv.Sniffer's regexes can backtrack badly on long quoted fields
+    header = sample.split("\n", 1)[0]
+    is_tsv = filename.lower().endswith(".tsv")
+    if is_tsv and "\t" in header:
+        return "\t"
+    counts = {d: header.count(d) for d in (",", "\t", ";")}
+    d = max(counts, key=counts.get)
+    if counts[d]:
+        return d
+    return "\t" if is_tsv else ","
+
+# logical field -> accepted headers, in order of preference
+_CSV_FIELDS = {
+    "title": ("Item Title", "Title"),
+    "venue": ("Publication Title",),
+    "series": ("Book Series Title", "Series Title"),
+    "volume": ("Journal Volume", "Volume"),
+    "number": ("Journal Issue", "Issue"),
+    "doi": ("Item DOI", "DOI"),
+    "url": ("URL", "Landing Page"),
+    "authors": ("Authors", "Author"),
+    "year": ("Publication Year", "Year"),
+    "content_type": ("Content Type",),
+}
+
+def _norm_header(h: Optional[str]) -> str:
+    return _WS_RE.sub(" ", (h or "").strip().lower())
+
+def _resolve_columns(fieldnames: List[str]) -> Dict[str, tuple]:
+    # case/space-insensitive header matching, done once per file instead of per lookup;
+    # maps each logical field to column positions (last duplicate wins, as in DictReader)
+    hmap = {_norm_header(h): i for i, h in enumerate(fieldnames)}
+    return {
+        field: tuple(hmap[k] for k in map(_norm_header, cands) if k in hmap)
+        for field, cands in _CSV_FIELDS.items()
+    }
+
+def _get_row_val(values: List[str], idxs: tuple) -> Optional[str]:
+    for i in idxs:
+        if i < len(values):
+            v = values[i].strip()
+            if v:
+                return v
     return None
 
+def _row_dict(fieldnames: List[str], values: List[str]) -> Dict[Any, Any]:
+    # Same shape csv.DictReader gives: missing trailing fields are None,
+    # surplus values are collected under the None key
+    row: Dict[Any, Any] = dict(zip(fieldnames, values))
+    if len(values) > len(fieldnames):
+        row[None] = values[len(fieldnames):]
+    elif len(values) < len(fieldnames):
+        for key in fieldnames[len(values):]:
+            row[key] = None
+    return row
 
-def _normalize_row(row: Dict[str, Any], source_file: str, source_folder: str) -> Dict[str, Any]:
-    title = _get_row_val(row, "Item Title", "Title")
-    venue = _get_row_val(row, "Publication Title")
-    series = _get_row_val(row, "Book Series Title", "Series Title")
-    volume = _get_row_val(row, "Journal Volume", "Volume")
-    number = _get_row_val(row, "Journal Issue", "Issue")
-    doi_raw = _get_row_val(row, "Item DOI", "DOI")
+
+def _unmapped_fields(fieldnames: List[str], values: List[str], cols: Dict[str, tuple]) -> Dict[Any, Any]:
+    # raw columns not already mapped onto the schema
+    row = _row_dict(fieldnames, values)
+    for idxs in cols.values():
+        for i in idxs:
+            row.pop(fieldnames[i], None)
+    return row
+
+def _normalize_row(values: List[str], fieldnames: List[str], cols: Dict[str, tuple],
+                   source_name: str, source_folder: str, keep_raw: bool = False) -> Dict[str, Any]:
+    title = _get_row_val(values, cols["title"])
+    venue = _get_row_val(values, cols["venue"])
+    series = _get_row_val(values, cols["series"])
+    volume = _get_row_val(values, cols["volume"])
+    number = _get_row_val(values, cols["number"])
+    doi_raw = _get_row_val(values, cols["doi"])
     doi = _clean_doi(doi_raw)
-    url = _get_row_val(row, "URL", "Landing Page")
-    authors = _split_authors_csv(_get_row_val(row, "Authors", "Author"))
-    year = _safe_int(_get_row_val(row, "Publication Year", "Year"))
-    content_type = _get_row_val(row, "Content Type")
+    url = _get_row_val(values, cols["url"])
+    authors = _split_authors_csv(_get_row_val(values, cols["authors"]))
+    year = _safe_int(_get_row_val(values, cols["year"]))
+    content_type = _get_row_val(values, cols["content_type"])
 
     entry_type = None
     vt = _detect_venue_type(content_type)
@@ -108,7 +194,8 @@ def _normalize_row(row: Dict[str, Any], source_file: str, source_folder: str) ->
         entry_type = "inbook" if content_type and "chapter" in content_type.lower() else "book"
 
     # choose a cite_key/id: prefer DOI, else slug on first author + year + title
-    cite_key = doi if doi else _slugify(f"{authors[0]['last'] if authors else ''}-{year or ''}-{title or ''}")
+    slug = _slugify(f"{authors[0]['last'] if authors else ''}-{year or ''}-{title or ''}")
+    cite_key = doi if doi else slug
 
     normalized = {
         "id": cite_key,
@@ -135,70 +222,78 @@ def _normalize_row(row: Dict[str, Any], source_file: str, source_folder: str) ->
         "series": series,
         "address": None,
         "location": None,
-        "source_file": os.path.basename(source_file),
+        "source_file": source_name,
         "source_folder": source_folder,
         "source_platform": "SpringerLink",
         "source_provider": "springerlink",
         "cite_key": cite_key,
-        "key_normalized": _slugify(f"{authors[0]['last'] if authors else ''}-{year or ''}-{title or ''}") if title else None,
+        "key_normalized": slug if title else None,
         "hash": _compute_hash(title, authors, year),
         "tags": [],
-        "extra": {"raw": row},
+        "extra": {"raw": _unmapped_fields(fieldnames, values, cols)} if keep_raw else {},
         "url_via_proxy": bool(url and "ezproxy" in url.lower()),
         "content_type": content_type,
     }
     return normalized
 
-def read_csv_file(file_path: str) -> List[Dict[str, Any]]:
+def read_csv_file(file_path: str, keep_raw: bool = False) -> List[Dict[str, Any]]:
     """
     Parse one SpringerLink CSV/TSV file and return normalized entries.
     Auto-detects delimiter between ',', '\\t', ';'
+    With keep_raw, columns not mapped onto the schema are kept under extra["raw"].
     """
     entries: List[Dict[str, Any]] = []
+    source_name = os.path.basename(file_path)
+    source_folder = os.path.dirname(file_path)
     with open(file_path, "r", encoding="utf-8-sig", newline="") as f:
         sample = f.read(4096)
         f.seek(0)
-        try:
-            dialect = csv.Sniffer().sniff(sample, delimiters=",\t;")
-        except Exception:
-            # fallback: comma
-            dialect = csv.excel
-        reader = csv.DictReader(f, dialect=dialect)
-        for row in reader:
+        # Plain csv.reader rows (lists) indexed by column position; no per-row dict
+        reader = csv.reader(f, delimiter=_sniff_delim(sample, file_path))
+        fieldnames = next(reader, None) or []
+        cols = _resolve_columns(fieldnames)
+        for values in reader:
+            if not values:
+                continue  # blank line, skipped by DictReader too
             try:
-                norm = _normalize_row(row, source_file=file_path, source_folder=os.path.dirname(file_path))
+                norm = _normalize_row(values, fieldnames, cols, source_name=source_name, source_folder=source_folder, keep_raw=keep_raw)
                 entries.append(norm)
             except Exception as ex:
-                print(f"[WARN] Skipped row in {os.path.basename(file_path)}: {ex}")
+                print(f"[WARN] Skipped row in {source_name}: {ex}")
     return entries
 
-def normalize_csv_dir(dirpath: str, file_extension: str = ".csv") -> List[Dict[str, Any]]:
+def _summary_line(e: Dict[str, Any]) -> str:
+    title = (e.get("title") or "").replace("\n", " ")
+    title_short = (title[:77] + "...") if len(title) > 80 else title
+    return f"• {e['id']} | {e.get('entry_type')} | {e.get('year')} | springerlink | {title_short}\n"
+
+def normalize_csv_dir(dirpath: str, file_extension: str = ".csv", keep_raw: bool = False,
+                      verbose: bool = False) -> List[Dict[str, Any]]:
     """
     Walk a directory, parse every *.csv (or .tsv if you pass file_extension), return normalized entries.
+    Files are parsed in parallel worker processes when there are enough of them.
+    With keep_raw, columns not mapped onto the schema are kept under extra["raw"].
+    With verbose, a one-line summary per entry is written to stdout.
     """
+    paths = list_files(dirpath, file_extension.lower())
+    results = map_files(partial(safe_call, partial(read_csv_file, keep_raw=keep_raw)), paths)
+
     all_entries: List[Dict[str, Any]] = []
-    for filename in os.listdir(dirpath):
-        if filename.lower().endswith(file_extension.lower()):
-            path = os.path.join(dirpath, filename)
-            try:
-                all_entries.extend(read_csv_file(path))
-            except Exception as ex:
-                print(f"[WARN] Failed to parse {path}: {ex}")
+    for path, (entries, error) in zip(paths, results):
+        if error is not None:
+            print(f"[WARN] Failed to parse {path}: {error}")
+            continue
+        all_entries.extend(entries)
 
-    # Compact summary (mirrors bib_reader)
-    for e in all_entries:
-        yr = e.get("year")
-        et = e.get("entry_type")
-        title = (e.get("title") or "").replace("\n", " ")
-        title_short = (title[:77] + "...") if len(title) > 80 else title
-        print(f"• {e['id']} | {et} | {yr} | springerlink | {title_short}")
+    if verbose:
+        # Compact summary (mirrors bib_reader), written in one go
+        sys.stdout.write("".join(map(_summary_line, all_entries)))
 
     return all_entries
 
 def dump_ndjson(entries: List[Dict[str, Any]], out_path: str) -> None:
-    with open(out_path, "w", encoding="utf-8") as f:
-        for e in entries:
-            f.write(json.dumps(e, ensure_ascii=False) + "\n")
+    # raw rows may carry a None key (surplus values), hence non_str_keys
+    write_ndjson(entries, out_path, non_str_keys=True)
 
 
 
@@ -209,9 +304,11 @@ if __name__ == "__main__":
     ap.add_argument("dir", help="Directory containing .csv/.tsv files")
     ap.add_argument("--ext", default=".csv", help="File extension to scan (default: .csv). Use .tsv if needed.")
     ap.add_argument("--out", help="NDJSON output path (optional)")
+    ap.add_argument("--keep-raw", action="store_true", help="Keep unmapped CSV columns under extra.raw")
+    ap.add_argument("--quiet", action="store_true", help="Do not list every parsed entry")
     args = ap.parse_args()
 
-    items = normalize_csv_dir(args.dir, file_extension=args.ext)
+    items = normalize_csv_dir(args.dir, file_extension=args.ext, keep_raw=args.keep_raw, verbose=not args.quiet)
     if args.out:
         dump_ndjson(items, args.out)
         print(f"Saved {len(items)} entries to {args.out}")
@@ -0,0 +1,92 @@
+"""
+Per-file helpers shared by the readers, bib2table and zhang_metrics: directory
+listing, the process-pool map and the NDJSON writer behind dump_ndjson.
+
+map_files applies a function to every input file, in worker processes once
+there are enough files to pay for the pool. Files are scheduled largest-first
+and dealt round-robin into batched tasks, so no single task ends up holding
+all the big files while the other workers sit idle.
+"""
+
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+try:
+    import orjson  # optional: much faster encoder for write_ndjson
+except ImportError:
+    orjson = None
+
+# Below this many files a process pool costs more than it saves
+_PARALLEL_MIN_FILES = 4
+
+# Tasks per CPU: enough to balance uneven files, few enough that many small
+# files travel in batches instead of one IPC round trip each
+_TASKS_PER_CPU = 4
+
+# NDJSON output buffer; large enough that a dump is a handful of write syscalls
+_WRITE_BUFFER_SIZE = 4 * 1024 * 1024
+
+
+def list_files(dirpath, extensions):
+    # scandir entries carry the name and file type, so no extra stat per file
+    with os.scandir(dirpath) as it:
+        return [de.path for de in it if de.name.lower().endswith(extensions) and de.is_file()]
+
+
+def safe_call(fn, path):
+    # Worker entry point: report failures back instead of aborting the pool
+    try:
+        return fn(path), None
+    except Exception as ex:
+        return None, str(ex)
+
+
+def _file_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0  # fn reports the error when it opens the file
+
+
+def _map_chunk(fn, paths):
+    # One pool task: several files in a single IPC round trip
+    return [fn(path) for path in paths]
+
+
+def map_files(fn, paths):
+    """
+    Apply fn to every path, in worker processes when there are enough paths.
+    fn must be picklable (a module-level function or a partial of one).
+    Results come back in the order of paths.
+    """
+    if len(paths) < _PARALLEL_MIN_FILES:
+        return list(map(fn, paths))
+    # Largest first, dealt round-robin across tasks: ex.map's chunksize would
+    # cut contiguous slices and put all the big files in the same task
+    order = sorted(range(len(paths)), key=lambda i: _file_size(paths[i]), reverse=True)
+    n_chunks = min(len(paths), (os.cpu_count() or 1) * _TASKS_PER_CPU)
+    chunks = [order[c::n_chunks] for c in range(n_chunks)]
+    results = [None] * len(paths)
+    with ProcessPoolExecutor() as ex:
+        for chunk, chunk_res in zip(chunks, ex.map(partial(_map_chunk, fn), [[paths[i] for i in c] for c in chunks])):
+            for i, res in zip(chunk, chunk_res):
+                results[i] = res
+    return results
+
+
+def write_ndjson(entries, out_path, non_str_keys=False):
+    """
+    Save entries to NDJSON (one JSON object per line) through a large write
+    buffer, so the OS sees few, big writes. Uses orjson when installed, stdlib
+    json otherwise. non_str_keys lets orjson accept non-string dict keys,
+    which stdlib json already converts.
+    """
+    if orjson is not None:
+        opts = orjson.OPT_APPEND_NEWLINE | (orjson.OPT_NON_STR_KEYS if non_str_keys else 0)
+        with open(out_path, "wb", buffering=_WRITE_BUFFER_SIZE) as f:
+            f.writelines(orjson.dumps(e, option=opts) for e in entries)
+        return
+    with open(out_path, "w", encoding="utf-8", buffering=_WRITE_BUFFER_SIZE) as f:
+        f.writelines(json.dumps(e, ensure_ascii=False) + "\n" for e in entries)
@@ -4,189 +4,414 @@ import sys
 import json
 import re
 import hashlib
+import pickle
+from collections import Counter
+from functools import lru_cache, partial
 from urllib.parse import unquote
 
 import bibtexparser
-from bibtexparser.bparser import BibTexParser
+from bibtexparser.bibdatabase import COMMON_STRINGS, STANDARD_TYPES
 from bibtexparser.customization import convert_to_unicode
 
+try:
+    from .readers.bib_scanner import scan_entries
+    from .readers.file_pool import list_files, map_files
+except ImportError:  # ejecutado como script: python src/zhang_metrics.py
+    from readers.bib_scanner import scan_entries
+    from readers.file_pool import list_files, map_files
+
 import csv
 
 from datetime import datetime
 
-import re
+try:
+    import orjson  # opcional: serializa el reporte mucho más rápido
+except ImportError:
+    orjson = None
 
 DOI_RE = re.compile(r"^10\.\d{4,9}/\S+$", re.IGNORECASE)
+_WS_RE = re.compile(r"\s+")
+# prefijo de resolver + DOI + residuos al final en una sola pasada; el DOI
+# debe terminar en algo que no sea residuo (igual que quitarlos y validar)
+_DOI_ALL = re.compile(r"^(?:https?://(?:dx\.)?doi\.org/)?(10\.\d{4,9}/\S*[^\s\]\).;,])[\]\).;,]*$", re.I)
+# _DOI_ALL por línea sobre DOIs unidos con \n; la segunda rama hace que cada
+# línea dé exactamente un resultado ("" si no es DOI) para alinearlos
+_DOI_LINES_RE = re.compile(r"^(?:(?:https?://(?:dx\.)?doi\.org/)?(10\.\d{4,9}/.*[^\s\]\).;,])[\]\).;,]*|.*)$", re.I | re.M)
+# lo que exige la normalización previa de clean_doi (%-escapes, espacios, invisibles)
+_DOI_BATCH_UNSAFE_RE = re.compile(r"[%\u200b\u200c\u200d]|[^\S\n]")
+# Sin re.I: se aplican sobre el texto ya en minúsculas (extract_dois_from_text)
+_BARE_DOI_RE = re.compile(r"10\.\d{4,9}/\S+")
+_DOI_URL_FIND_RE = re.compile(r"https?://(?:dx\.)?doi\.org/\S+")
+_TARGETS_SPLIT_RE = re.compile(r"[\s,]+")
+
+# Campos de BibTeX que usa el cálculo
+_BIB_FIELDS = ("doi", "title", "year")
+
+# Bloques de lectura del --targets-file (dumps grandes no se cargan completos)
+_TARGETS_BLOCK_SIZE = 1 << 20
+
+# Muestra para detectar el delimitador: _sniff_delim solo cuenta en la línea de
+# cabecera, así que alcanza con lo mismo que lee csv_reader. csv.Sniffer
+# (--strict-sniff) mira las filas y necesita una muestra más amplia
+_SNIFF_SAMPLE_SIZE = 4096
+_STRICT_SNIFF_SAMPLE_SIZE = 64 * 1024
+
+# Caché en disco de archivos ya parseados (--cache). La clave incluye una huella
+# del código de los parsers, así que editarlos invalida el caché sin tocar la
+# versión; las entradas sin usar en _CACHE_MAX_AGE se borran solas. Para vaciarlo
+# a mano basta con borrar _CACHE_DIR.
+_CACHE_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "zhang_metrics")
+_CACHE_VERSION = 1
+_CACHE_MAX_AGE = 30 * 24 * 3600  # segundos
+
+class Detail:
+    """
+    Registros recuperados como columnas paralelas (una lista por campo) en vez
+    de un dict por registro. as_records() arma los dicts solo si se piden.
+    Los workers devuelven las columnas como tupla de listas planas (ver
+    _build_columns), no un Detail: así lo que viaja por IPC y lo que queda en
+    el caché no depende de si el módulo es __main__ o src.zhang_metrics.
+    """
+    __slots__ = ("ids", "dois", "titles", "years", "source_files")
+
+    def __init__(self, ids=(), dois=(), titles=(), years=(), source_files=()):
+        self.ids = list(ids)
+        self.dois = list(dois)
+        self.titles = list(titles)
+        self.years = list(years)
+        self.source_files = list(source_files)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def extend(self, columns):
+        ids, dois, titles, years, source_files = columns
+        self.ids.extend(ids)
+        self.dois.extend(dois)
+        self.titles.extend(titles)
+        self.years.extend(years)
+        self.source_files.extend(source_files)
+
+    def as_records(self):
+        return (
+            {"id": i, "doi": d, "title": t, "year": y, "source_file": s}
+            for i, d, t, y, s in zip(self.ids, self.dois, self.titles, self.years, self.source_files)
+        )
+
+@lru_cache(maxsize=None)
+def _code_fingerprint():
+    """
+    Hash del fuente de este módulo y del scanner de BibTeX, más la versión de
+    bibtexparser (convert_to_unicode, COMMON_STRINGS): si cambia el parseo,
+    cambian las claves y lo cacheado antes deja de usarse.
+    """
+    h = hashlib.blake2b(bibtexparser.__version__.encode("utf-8"), digest_size=8)
+    for mod_file in (__file__, sys.modules[scan_entries.__module__].__file__):
+        with open(mod_file, "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+def _cache_path(path, tag):
+    st = os.stat(path)
+    key = f"{_CACHE_VERSION}|{_code_fingerprint()}|{tag}|{os.path.abspath(path)}|{st.st_size}|{st.st_mtime_ns}"
+    return os.path.join(_CACHE_DIR, hashlib.blake2b(key.encode("utf-8"), digest_size=16).hexdigest() + ".pkl")
+
+def _map_files_cached(fn, paths, tag, keep=None):
+    """
+    map_files con caché en disco por archivo, con clave (ruta, tamaño, mtime):
+    solo se parsean los archivos nuevos o modificados. Cualquier fallo del
+    caché (ilegible, sin permisos) cuenta como miss y no corta la corrida.
+    keep(resultado) decide si se guarda; así un fallo del worker (p. ej. un
+    PermissionError que se arregla con chmod, sin tocar el mtime) no queda
+    cacheado y el archivo se vuelve a leer en la próxima corrida.
+    """
+    results = [None] * len(paths)
+    cache_paths = [None] * len(paths)
+    missing = []
+    for i, path in enumerate(paths):
+        try:
+            cache_paths[i] = _cache_path(path, tag)
+            with open(cache_paths[i], "rb") as f:
+                results[i] = pickle.load(f)
+        except Exception:
+            missing.append(i)
+            continue
+        try:
+            os.utime(cache_paths[i])  # marca de uso para _prune_cache
+        except OSError:
+            pass
 
-def _get_row_val(row, *candidates: str):
+    for i, res in zip(missing, map_files(fn, [paths[i] for i in missing])):
+        results[i] = res
+        if cache_paths[i] is None or (keep is not None and not keep(res)):
+            continue
+        try:
+            os.makedirs(_CACHE_DIR, exist_ok=True)
+            tmp = f"{cache_paths[i]}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                pickle.dump(res, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, cache_paths[i])
+        except Exception:
+            pass
+    if missing:
+        _prune_cache()
+    return results
+
+def _prune_cache(max_age=_CACHE_MAX_AGE):
     """
-    Acceso case-insensitive y con tolerancia a espacios en el header.
+    Borra las entradas del caché sin usar en max_age segundos (huellas de
+    código viejas, archivos movidos o borrados). Errores se ignoran.
     """
-    norm = {re.sub(r"\s+", " ", k.strip().lower()): v for k, v in row.items()}
-    for cand in candidates:
-        key = re.sub(r"\s+", " ", cand.strip().lower())
-        if key in norm:
-            val = norm[key]
-            if val is not None and str(val).strip() != "":
-                return str(val).strip()
-    return None
+    cutoff = datetime.now().timestamp() - max_age
+    try:
+        entries = list(os.scandir(_CACHE_DIR))
+    except OSError:
+        return
+    for entry in entries:
+        try:
+            if entry.name.endswith((".pkl", ".tmp")) and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+        except OSError:
+            pass
 
-def _has_springer_headers(fieldnames: list[str]) -> bool:
-    if not fieldnames:
-        return False
-    norm = {re.sub(r"\s+", " ", (f or "").strip().lower()) for f in fieldnames}
-    return ("item title" in norm or "title" in norm) and ("item doi" in norm or "doi" in norm)
+def _collect(per_file_detail):
+    """
+    Une las columnas de cada archivo en un Detail y arma los conjuntos de IDs y DOIs.
+    """
+    detail = Detail()
+    for columns in per_file_detail:
+        detail.extend(columns)
+    return set(detail.ids), set(filter(None, detail.dois)), detail
+
+# (title, year, doi): headers aceptados por fuente, en orden de preferencia
+_SPRINGER_COLUMNS = (("Item Title", "Title"), ("Publication Year", "Year"), ("Item DOI", "DOI"))
+_IEEE_COLUMNS = (("Document Title", "Title"), ("Publication Year", "Year"), ("DOI",))
+_SOURCE_COLUMNS = {"springer": _SPRINGER_COLUMNS, "ieee": _IEEE_COLUMNS}
 
-def _has_ieee_headers(fieldnames: list[str]) -> bool:
-    if not fieldnames:
-        return False
-    norm = {re.sub(r"\s+", " ", (f or "").strip().lower()) for f in fieldnames}
+def _norm_header(h):
+    return _WS_RE.sub(" ", (h or "").strip().lower())
+
+def _resolve_columns(fieldnames, columns):
+    """
+    Resuelve una vez por archivo (case-insensitive y con tolerancia a espacios)
+    en qué posiciones están las columnas de cada campo lógico.
+    Con headers repetidos gana el último, igual que con DictReader.
+    """
+    hidx = {_norm_header(h): i for i, h in enumerate(fieldnames)}
+    return tuple(
+        tuple(hidx[k] for k in map(_norm_header, cands) if k in hidx)
+        for cands in columns
+    )
+
+def _get_row_val(values, idxs):
+    # Acceso posicional sobre la fila de csv.reader; filas cortas → None
+    for i in idxs:
+        if i < len(values):
+            val = values[i].strip()
+            if val:
+                return val
+    return None
+
+def _sniff_delim(sample: str, filename: str) -> str:
+    """
+    Delimitador más frecuente entre ',', '\t' y ';' en la línea de cabecera
+    (los títulos de las filas pueden llevar comas); un .tsv con algún tab en
+    la cabecera es siempre '\t'.
+    Evita csv.Sniffer, cuyas regex pueden tardar mucho en campos largos.
+    """
+    header = sample.split("\n", 1)[0]
+    is_tsv = filename.lower().endswith(".tsv")
+    if is_tsv and "\t" in header:
+        return "\t"
+    counts = {d: header.count(d) for d in (",", "\t", ";")}
+    d = max(counts, key=counts.get)
+    if counts[d]:
+        return d
+    return "\t" if is_tsv else ","
+
+def _detect_source(fieldnames: list[str]):
+    """
+    "springer", "ieee" o None según los headers, normalizados una sola vez.
+    """
+    norm = set(map(_norm_header, fieldnames))
+    if ("item title" in norm or "title" in norm) and ("item doi" in norm or "doi" in norm):
+        return "springer"
     # IEEE Xplore típicos
-    return ("document title" in norm) and ("publication year" in norm or "year" in norm) and ("doi" in norm)
+    if ("document title" in norm) and ("publication year" in norm or "year" in norm) and ("doi" in norm):
+        return "ieee"
+    return None
 
-def _extract_row_springer(row):
-    title = _get_row_val(row, "Item Title", "Title")
-    year  = _get_row_val(row, "Publication Year", "Year")
-    doi   = _get_row_val(row, "Item DOI", "DOI")
-    return title, year, doi
+def _csv_reader(f, sample, name, strict_sniff=False):
+    """
+    csv.reader con el delimitador por conteo (_sniff_delim). Con strict_sniff
+    se intenta antes csv.Sniffer (más lento, detecta también el quoting).
+    """
+    if strict_sniff:
+        try:
+            return csv.reader(f, csv.Sniffer().sniff(sample, delimiters=",\t;"))
+        except csv.Error:
+            pass
+    return csv.reader(f, delimiter=_sniff_delim(sample, name))
 
-def _extract_row_ieee(row):
-    title = _get_row_val(row, "Document Title", "Title")
-    year  = _get_row_val(row, "Publication Year", "Year")
-    doi   = _get_row_val(row, "DOI")
-    return title, year, doi
+def _parse_csv_file(path, strict_sniff=False):
+    """
+    Un CSV/TSV → (columnas, avisos, falló). Corre en procesos worker, así que
+    los avisos se devuelven para imprimirlos en orden desde el proceso
+    principal; falló indica que el archivo no se pudo leer completo.
+    """
+    name = os.path.basename(path)
+    warnings = []
+    # Primera pasada: valores crudos; los DOIs se limpian juntos al final
+    titles, years, raw_dois = [], [], []
+    try:
+        with open(path, "r", encoding="utf-8-sig", newline="") as f:
+            sample = f.read(_STRICT_SNIFF_SAMPLE_SIZE if strict_sniff else _SNIFF_SAMPLE_SIZE)
+            f.seek(0)
+            # csv.reader (listas) + índices resueltos por archivo: sin dict por fila
+            reader = _csv_reader(f, sample, name, strict_sniff)
+            fns = next(reader, None) or []
+
+            columns = _SOURCE_COLUMNS.get(_detect_source(fns))
+            if columns is None:
+                warnings.append(f"[WARN] Skipping {name}: headers not recognized as Springer/IEEE")
+                return _build_columns([], [], [], name), warnings, False
+            title_cols, year_cols, doi_cols = _resolve_columns(fns, columns)
+
+            for values in reader:
+                if not values:
+                    continue  # línea en blanco (DictReader también las saltaba)
+                try:
+                    title = _get_row_val(values, title_cols)
+                    year = _get_row_val(values, year_cols)
+                    doi_raw = _get_row_val(values, doi_cols)
+                except Exception as ex:
+                    warnings.append(f"[WARN] Skipped row in {name}: {ex}")
+                    continue
+                titles.append(title)
+                years.append(year)
+                raw_dois.append(doi_raw)
+    except Exception as ex:
+        warnings.append(f"[WARN] Failed to parse {name}: {ex}")
+        failed = True
+    else:
+        failed = False
+    return _build_columns(titles, years, _clean_dois(raw_dois), name), warnings, failed
 
-def parse_csv_dir(csv_dir: str, extensions: tuple[str, ...] = (".csv", ".tsv")):
+def parse_csv_dir(csv_dir: str, extensions: tuple[str, ...] = (".csv", ".tsv"), strict_sniff: bool = False,
+                  cache: bool = False):
     """
     CSV/TSV → conjuntos equivalentes a parse_bib_dir
     Soporta SpringerLink e IEEE Xplore (auto-detección por headers).
+    Los archivos se procesan en paralelo cuando hay suficientes.
+    strict_sniff: detectar el dialecto con csv.Sniffer en vez del conteo rápido.
+    cache: reutilizar lo parseado en corridas anteriores para archivos sin cambios.
     Returns:
       - retrieved_ids: set canonical (doi:... o fallback_id)
       - retrieved_dois: set de DOIs
-      - detail: lista dicts {id, doi, title, year, source_file}
+      - detail: Detail (columnas id, doi, title, year, source_file)
     """
-    retrieved_ids = set()
-    retrieved_dois = set()
-    detail = []
-
-    for name in os.listdir(csv_dir):
-        if not name.lower().endswith(extensions):
-            continue
-        path = os.path.join(csv_dir, name)
-        try:
-            with open(path, "r", encoding="utf-8-sig", newline="") as f:
-                sample = f.read(4096)
-                f.seek(0)
-                try:
-                    dialect = csv.Sniffer().sniff(sample, delimiters=",\t;")
-                except Exception:
-                    dialect = csv.excel_tab if name.lower().endswith(".tsv") else csv.excel
-
-                reader = csv.DictReader(f, dialect=dialect)
-                fns = reader.fieldnames or []
-
-                if _has_springer_headers(fns):
-                    extractor = _extract_row_springer
-                elif _has_ieee_headers(fns):
-                    extractor = _extract_row_ieee
-                else:
-                    print(f"[WARN] Skipping {name}: headers not recognized as Springer/IEEE")
-                    continue
-
-                for row in reader:
-                    try:
-                        title, year, doi_raw = extractor(row)
-                        doi = clean_doi(doi_raw)
-                        if doi:
-                            cid = f"doi:{doi}"
-                            retrieved_dois.add(doi)
-                        else:
-                            cid = fallback_id(title, year)
-
-                        retrieved_ids.add(cid)
-                        detail.append({
-                            "id": cid,
-                            "doi": doi,
-                            "title": title,
-                            "year": year,
-                            "source_file": name,
-                        })
-                    except Exception as ex:
-                        print(f"[WARN] Skipped row in {name}: {ex}")
-        except Exception as ex:
-            print(f"[WARN] Failed to parse {name}: {ex}")
-
-    return retrieved_ids, retrieved_dois, detail
+    paths = list_files(csv_dir, extensions)
+    fn = partial(_parse_csv_file, strict_sniff=strict_sniff)
+    if cache:
+        results = _map_files_cached(fn, paths, f"csv|strict_sniff={strict_sniff}",
+                                    keep=lambda res: not res[2])
+    else:
+        results = map_files(fn, paths)
+    per_file = []
+    for columns, warnings, _ in results:
+        for w in warnings:
+            print(w)
+        per_file.append(columns)
+    return _collect(per_file)
 
 def clean_doi(doi):
     if not doi:
         return None
-    s = str(doi)
+    return _clean_doi_cached(str(doi))
+
+
+# El mismo DOI aparece muchas veces (duplicados entre archivos y bases,
+# menciones repetidas en targets), así que se memoiza la limpieza
+@lru_cache(maxsize=100_000)
+def _clean_doi_cached(s):
     s = unquote(s)
     # elimina espacios visibles y NO visibles dentro del DOI
     s = s.replace("\u200b","").replace("\u200c","").replace("\u200d","")
-    s = re.sub(r"\s+", "", s)
-
-    # prefijos de resolvers
-    s = re.sub(r"^https?://(?:dx\.)?doi\.org/", "", s, flags=re.I)
+    # str.split() corta exactamente en los mismos caracteres que \s
+    s = "".join(s.split())
 
-    # puntuación/residuos al final
-    s = re.sub(r"[\]\).;,]+$", "", s).strip()
-
-    # Valida patrón DOI
-    if not DOI_RE.match(s):
-        return None
-    return s.lower()
+    # Quita prefijo de resolver y residuos al final, y valida el patrón DOI.
+    # Internado: el mismo DOI en detail, retrieved y relevant es un solo
+    # objeto, y la comparación en los sets se resuelve por identidad
+    m = _DOI_ALL.match(s)
+    return sys.intern(m.group(1).lower()) if m else None
 
 
 def fallback_id(title, year):
     t = (title or "").strip().lower()
     y = (str(year).strip() if year else "")
     base = f"{t}||{y}"
-    return "ttlY:" + hashlib.sha1(base.encode("utf-8")).hexdigest()
+    # blake2b: solo es una clave de deduplicación, no necesita SHA-1
+    return "ttlY:" + hashlib.blake2b(base.encode("utf-8"), digest_size=16).hexdigest()
 
 
-def parse_bib_dir(bibs_dir):
+def _clean_dois(raws):
+    """
+    clean_doi sobre una lista completa, alineada con la entrada. Si ningún
+    valor necesita la normalización previa, se validan todos con una sola
+    pasada de regex sobre los valores unidos por saltos de línea.
     """
+    present = [r for r in raws if r]
+    if not present:
+        return [None] * len(raws)
+    blob = "\n".join(present)
+    if blob.count("\n") != len(present) - 1 or _DOI_BATCH_UNSAFE_RE.search(blob):
+        return [clean_doi(r) for r in raws]
+    found = iter(_DOI_LINES_RE.findall(blob.lower()))
+    return [(sys.intern(next(found)) or None) if r else None for r in raws]
+
+def _build_columns(titles, years, dois, source_file):
+    # (ids, dois, titles, years, source_files): lo que Detail.extend recibe
+    ids = [f"doi:{doi}" if doi else fallback_id(title, year) for title, year, doi in zip(titles, years, dois)]
+    return (ids, dois, titles, years, [source_file] * len(ids))
+
+
+def _parse_bib_file(path):
+    """
+    Un .bib → columnas de Detail (ver _build_columns).
+    """
+    name = os.path.basename(path)
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+
+    # Macros: meses + los @string del archivo, como BibTexParser(common_strings=True)
+    macros = dict(COMMON_STRINGS)
+    titles, years, raw_dois = [], [], []
+    for _, _, entry_type, _, fields in scan_entries(text, macros):
+        if entry_type not in STANDARD_TYPES:
+            continue  # @string/@comment y tipos no estándar, como BibTexParser
+        # Solo los campos que se usan pasan por la conversión LaTeX → unicode
+        e = convert_to_unicode({k: fields[k] for k in _BIB_FIELDS if k in fields})
+        titles.append(e.get("title"))
+        years.append(e.get("year"))
+        raw_dois.append(e.get("doi"))
+    return _build_columns(titles, years, _clean_dois(raw_dois), name)
+
+
+def parse_bib_dir(bibs_dir, cache=False):
+    """
+    Files are parsed in parallel worker processes when there are enough of them.
+    With cache=True, results for files unchanged since a previous run are read
+    from the on-disk cache instead of being parsed again.
     Returns:
       - retrieved_ids: set of canonical IDs (prefer DOI; fallback to title-year hash)
       - retrieved_dois: set of DOIs only (subset of retrieved_ids)
-      - detail: list of dicts with {id, doi, title, year, source_file}
+      - detail: Detail with id/doi/title/year/source_file columns (as_records() for dicts)
     """
-    parser = BibTexParser(common_strings=True)
-    parser.customization = convert_to_unicode
-
-    retrieved_ids = set()
-    retrieved_dois = set()
-    detail = []
-
-    for name in os.listdir(bibs_dir):
-        if not name.lower().endswith(".bib"):
-            continue
-        path = os.path.join(bibs_dir, name)
-        with open(path, encoding="utf-8") as f:
-            db = bibtexparser.load(f, parser=parser)
-
-        for e in db.entries:
-            doi = clean_doi(e.get("doi") or e.get("DOI"))
-            title = e.get("title")
-            year = e.get("year")
-            if doi:
-                cid = f"doi:{doi}"
-                retrieved_dois.add(doi)
-            else:
-                cid = fallback_id(title, year)
-
-            retrieved_ids.add(cid)
-            detail.append({
-                "id": cid,
-                "doi": doi,
-                "title": title,
-                "year": year,
-                "source_file": name,
-            })
-
-    return retrieved_ids, retrieved_dois, detail
+    paths = list_files(bibs_dir, ".bib")
+    if cache:
+        return _collect(_map_files_cached(_parse_bib_file, paths, "bib"))
+    return _collect(map_files(_parse_bib_file, paths))
 
 
 def extract_dois_from_text(text):
@@ -195,35 +420,55 @@ def extract_dois_from_text(text):
     Accepts raw DOIs (10.xxxx/...) and DOI resolver URLs (https://doi.org/10.xxxx/...).
     Ignores non-DOI URLs (e.g., ScienceDirect article pages).
     """
-    dois = set()
+    # clean_doi devuelve minúsculas, así que se busca en el texto en minúsculas
+    # con patrones sensibles a mayúsculas: empiezan con un literal y re salta
+    # directo a él, mientras que con re.I prueba cada posición del texto
+    low = text.lower()
 
     # Bare DOIs
-    for tok in re.findall(r"10\.\d{4,9}/\S+", text, flags=re.I):
-        d = clean_doi(tok)
-        if d:
-            dois.add(d)
+    dois = set(filter(None, map(clean_doi, _BARE_DOI_RE.findall(low))))
 
     # DOI resolver URLs
-    for tok in re.findall(r"https?://(?:dx\.)?doi\.org/\S+", text, flags=re.I):
-        d = clean_doi(tok)
-        if d:
-            dois.add(d)
+    dois.update(filter(None, map(clean_doi, _DOI_URL_FIND_RE.findall(low))))
 
     return dois
 
+def _read_text_blocks(f, size=_TARGETS_BLOCK_SIZE):
+    """
+    Lee un archivo de texto por bloques cortados en salto de línea: un DOI
+    nunca cruza un salto de línea, así que extraer por bloque da lo mismo
+    que leer el archivo completo.
+    """
+    tail = ""
+    while True:
+        block = f.read(size)
+        if not block:
+            if tail:
+                yield tail
+            return
+        block = tail + block
+        cut = block.rfind("\n") + 1
+        if cut:
+            yield block[:cut]
+            tail = block[cut:]
+        else:
+            tail = block
+
 def load_relevant(args):
     """
     Load relevant DOIs from either --targets-file (free text) or --targets-dois (comma/space separated).
     Returns set of DOIs (unique).
     """
     if args.targets_file:
+        dois = set()
         with open(args.targets_file, encoding="utf-8") as f:
-            text = f.read()
-        return extract_dois_from_text(text)
+            for block in _read_text_blocks(f):
+                dois |= extract_dois_from_text(block)
+        return dois
 
     if args.targets_dois:
         # Accept comma/space separated list
-        raw = re.split(r"[\s,]+", args.targets_dois)
+        raw = _TARGETS_SPLIT_RE.split(args.targets_dois)
         dois = set()
         for r in raw:
             d = clean_doi(r)
@@ -238,10 +483,13 @@ def load_relevant(args):
 def compute_metrics(args, out_path=None, count_duplicates=False):
     # 1) Cargar resultados desde la fuente seleccionada
     if args.bibs_dir:
-        retrieved_ids, retrieved_dois, detail = parse_bib_dir(args.bibs_dir)
+        retrieved_ids, retrieved_dois, detail = parse_bib_dir(
+            args.bibs_dir, cache=getattr(args, "cache", False))
         input_dir = args.bibs_dir
     else:
-        retrieved_ids, retrieved_dois, detail = parse_csv_dir(args.csv_dir)
+        retrieved_ids, retrieved_dois, detail = parse_csv_dir(
+            args.csv_dir, strict_sniff=getattr(args, "strict_sniff", False),
+            cache=getattr(args, "cache", False))
         input_dir = args.csv_dir
 
     # 2) Cargar relevantes (lista objetivo)
@@ -252,11 +500,23 @@ def compute_metrics(args, out_path=None, count_duplicates=False):
     TE = len(retrieved_ids)
     TE_doi = len(retrieved_dois)
     ER = len(relevant_dois)
-    TER_dois = relevant_dois.intersection(retrieved_dois)
-    TER = len(TER_dois)
 
-    FN = relevant_dois.difference(retrieved_dois)
-    FP = retrieved_dois.difference(relevant_dois)
+    if not relevant_dois or not retrieved_dois:
+        # Sin intersección posible: todo relevante es FN y todo recuperado FP
+        TER_dois = []
+        FN = sorted(relevant_dois)
+        FP = sorted(retrieved_dois)
+    else:
+        # Una sola pasada por los relevantes reparte TP (TER) y FN; en listas que
+        # se ordenan en su lugar, ya que el reporte las quiere ordenadas
+        TER_dois = []
+        FN = []
+        for d in relevant_dois:
+            (TER_dois if d in retrieved_dois else FN).append(d)
+        TER_dois.sort()
+        FN.sort()
+        FP = sorted(retrieved_dois.difference(relevant_dois))
+    TER = len(TER_dois)
 
     RC = 0.0 if ER == 0 else (TER / ER) * 100.0
     EF = 0.0 if TE == 0 else (TER / TE) * 100.0
@@ -271,9 +531,9 @@ def compute_metrics(args, out_path=None, count_duplicates=False):
         "TER": TER,
         "EF_percent": round(EF, 2),
         "RC_percent": round(RC, 2),
-        "TP_dois": sorted(TER_dois),
-        "FN_dois": sorted(FN),
-        "FP_dois": sorted(FP),
+        "TP_dois": TER_dois,
+        "FN_dois": FN,
+        "FP_dois": FP,
         "total_relevant": ER,
         "relevant_retrieved": TER,
         "studies_retrieved": TE,
@@ -288,32 +548,28 @@ def compute_metrics(args, out_path=None, count_duplicates=False):
 
     if out_path:
         os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
-        with open(out_path, "w", encoding="utf-8") as f:
-            json.dump(report, f, ensure_ascii=False, indent=2)
+        if orjson is not None:
+            with open(out_path, "wb") as f:
+                f.write(orjson.dumps(report, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+        else:
+            with open(out_path, "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
 
     return report, input_dir, detail
 
 def _summarize_duplicates(detail):
-    by_id = {}
-    by_doi = {}
-    by_fb  = {}
-    for d in detail:
-        cid = d.get("id")
-        doi = d.get("doi")
-        by_id[cid] = by_id.get(cid, 0) + 1
-        if doi:
-            by_doi[doi] = by_doi.get(doi, 0) + 1
-        elif cid and cid.startswith("ttlY:"):
-            by_fb[cid] = by_fb.get(cid, 0) + 1
-
-    dups_id = {k:v for k,v in by_id.items() if v>1}
-    dups_doi = {k:v for k,v in by_doi.items() if v>1}
-    dups_fb  = {k:v for k,v in by_fb.items() if v>1}
-
+    by_id = Counter(detail.ids)
+    by_doi = Counter(filter(None, detail.dois))
+    by_fb = Counter(
+        cid for cid, doi in zip(detail.ids, detail.dois)
+        if not doi and cid and cid.startswith("ttlY:")
+    )
+
+    # most_common() ya viene ordenado por frecuencia (estable en empates)
     return {
-        "duplicates_collapsed_total": sum(v-1 for v in dups_id.values()),
-        "duplicates_by_doi": sorted(([k,v] for k,v in dups_doi.items()), key=lambda x: -x[1]),
-        "duplicates_by_fallback": sorted(([k,v] for k,v in dups_fb.items()), key=lambda x: -x[1]),
+        "duplicates_collapsed_total": sum(v - 1 for v in by_id.values() if v > 1),
+        "duplicates_by_doi": [[k, v] for k, v in by_doi.most_common() if v > 1],
+        "duplicates_by_fallback": [[k, v] for k, v in by_fb.most_common() if v > 1],
     }
 
 
@@ -332,6 +588,14 @@ def build_parser():
     p.add_argument("--cb", help="Cadena de búsqueda (CB) para registrar en el reporte.", default=None)
 
     p.add_argument("--out", help="Optional JSON report path.")
+    p.add_argument("--strict-sniff", action="store_true",
+                   help="Detect the CSV dialect with csv.Sniffer (slower) instead of counting delimiters.")
+    p.add_argument("--quiet", action="store_true", help="Only write the JSON report; skip the console summary.")
+    p.add_argument("--list-limit", type=int, default=50,
+                   help="Max DOIs printed per TP/FN/FP list (0 = all); the JSON report keeps them all.")
+    p.add_argument("--cache", action=argparse.BooleanOptionalAction, default=False,
+                   help="Reuse parsed results of unchanged input files (cached under ~/.cache/zhang_metrics; "
+                        "entries unused for 30 days are pruned, delete the directory to clear it).")
     return p
 
 def resolve_output_path(out_arg: str | None, bibs_dir: str) -> str:
@@ -379,6 +643,46 @@ def resolve_output_path(out_arg: str | None, bibs_dir: str) -> str:
             return cand
         i += 1
 
+def _print_metrics(report):
+    """
+    Bloque principal de métricas, escrito de una sola vez.
+    """
+    lines = ["", "=== Zhang (2011) Metrics ==="]
+    if report.get("CB"):
+        lines.append(f"CB: {report['CB']}")
+    lines += [
+        f"ID (Identificados, crudos): {report['ID']}",
+        f"TE (Únicos): {report['TE']}  | TE_doi: {report['TE_doi']}",
+        f"ER (Relevantes totales): {report['ER']}",
+        f"TER (Relevantes recuperados): {report['TER']}",
+        f"RC (Recall/Sensibilidad) = TER/ER * 100 = {report['RC_percent']}%",
+        f"EF (Effort/Precisión)    = TER/TE * 100 = {report['EF_percent']}%",
+    ]
+    sys.stdout.write("\n".join(lines) + "\n")
+
+def _print_duplicates(d):
+    """
+    Resumen de duplicados (top 5 por DOI y por fallback), escrito de una sola vez.
+    """
+    lines = ["", f"Duplicados colapsados: {d['duplicates_collapsed_total']}"]
+    if d["duplicates_by_doi"]:
+        lines.append("  (por DOI, top 5):")
+        lines += [f"    - {doi} x{cnt}" for doi, cnt in d["duplicates_by_doi"][:5]]
+    if d["duplicates_by_fallback"]:
+        lines.append("  (por fallback title+year, top 5):")
+        lines += [f"    - {fb} x{cnt}" for fb, cnt in d["duplicates_by_fallback"][:5]]
+    sys.stdout.write("\n".join(lines) + "\n")
+
+def _print_dois(title, dois, limit=0):
+    """
+    Imprime una sección de DOIs con una sola escritura en vez de un print por DOI.
+    Con limit > 0 solo los primeros `limit` y cuántos faltan; el JSON los tiene todos.
+    """
+    head = dois[:limit] if limit > 0 else dois
+    more = len(dois) - len(head)
+    tail = f"  ... and {more} more\n" if more else ""
+    sys.stdout.write(f"\n{title}\n" + "".join(f"  - {d}\n" for d in head) + tail)
+
 def main():
     parser = build_parser()
     args = parser.parse_args()
@@ -393,45 +697,22 @@ def main():
 
     report, input_dir_used, detail = compute_metrics(args, out_path=out_path)
 
+    if not args.quiet:
+        _print_metrics(report)
 
-    print("\n=== Zhang (2011) Metrics ===")
-    if report.get("CB"):
-        print(f"CB: {report['CB']}")
-    print(f"ID (Identificados, crudos): {report['ID']}")
-    print(f"TE (Únicos): {report['TE']}  | TE_doi: {report['TE_doi']}")
-    print(f"ER (Relevantes totales): {report['ER']}")
-    print(f"TER (Relevantes recuperados): {report['TER']}")
-    print(f"RC (Recall/Sensibilidad) = TER/ER * 100 = {report['RC_percent']}%")
-    print(f"EF (Effort/Precisión)    = TER/TE * 100 = {report['EF_percent']}%")
-
-    if report["FN_dois"]:
-        print("\nMissing relevant (FN):")
-        for d in report["FN_dois"]:
-            print("  -", d)
-
-    if report["FP_dois"]:
-        print("\nFalse positives vs relevant list (FP, by DOI):")
-        for d in report["FP_dois"]:
-            print("  -", d)
-
-    if report["TP_dois"]:
-        print("\nRelevantes recuperados (TP, DOIs):")
-        for d in report["TP_dois"]:
-            print("  -", d)
+        if report["FN_dois"]:
+            _print_dois("Missing relevant (FN):", report["FN_dois"], args.list_limit)
+
+        if report["FP_dois"]:
+            _print_dois("False positives vs relevant list (FP, by DOI):", report["FP_dois"], args.list_limit)
+
+        if report["TP_dois"]:
+            _print_dois("Relevantes recuperados (TP, DOIs):", report["TP_dois"], args.list_limit)
     if args.out:
         print(f"\nSaved JSON report -> {out_path}")
-    
-    if report.get("duplicates"):
-        d = report["duplicates"]
-        print(f"\nDuplicados colapsados: {d['duplicates_collapsed_total']}")
-        if d["duplicates_by_doi"]:
-            print("  (por DOI, top 5):")
-            for doi, cnt in d["duplicates_by_doi"][:5]:
-                print(f"    - {doi} x{cnt}")
-        if d["duplicates_by_fallback"]:
-            print("  (por fallback title+year, top 5):")
-            for fb, cnt in d["duplicates_by_fallback"][:5]:
-                print(f"    - {fb} x{cnt}")
+
+    if not args.quiet and report.get("duplicates"):
+        _print_duplicates(report["duplicates"])
 
 
 """